@@ -1,18 +1,28 @@
 # main.py
 
 from __future__ import annotations
-import base64
+import asyncio
+import hashlib
+import logging
+import logging.handlers
 import os
-import tempfile
-from pathlib import Path
+import queue
+import time
+import urllib.parse
+from contextlib import asynccontextmanager
+from types import MappingProxyType
 from typing import Optional
 
 import httpx
+import orjson
+import pybase64
+from cachetools import TTLCache
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
 from dotenv import load_dotenv
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import traceback
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, ConfigDict
 
 # ---------------------------------------------------------------------------
 # Load environment variables
@@ -21,35 +31,163 @@ load_dotenv()
 
 ULCA_USER_ID = os.getenv("ULCA_USER_ID")
 ULCA_API_KEY = os.getenv("ULCA_API_KEY")
-BHASHINI_AUTH = os.getenv("BHASHINI_AUTH")
+# Comma-separated browser origins allowed by CORS. Defaults to the local dev
+# servers only, so deployments serving a browser frontend must set this.
+CORS_ORIGINS = [
+    o.strip()
+    for o in os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:5173").split(",")
+    if o.strip()
+]
 
-if not all([ULCA_USER_ID, ULCA_API_KEY, BHASHINI_AUTH]):
+if not all([ULCA_USER_ID, ULCA_API_KEY]):
     raise RuntimeError("Missing API keys in .env")
 
+ULCA_CFG_HEADERS = MappingProxyType({
+    "userID": ULCA_USER_ID,
+    "ulcaApiKey": ULCA_API_KEY,
+})
+
 ASR_PIPELINE_ID = "64392f96daac500b55c543cd"
-TRANSLATE_URL = "https://bhashini.gov.in/ulca/apis/v1/translate"
-TTS_URL = "https://bhashini.gov.in/ulca/apis/v1/synthesize"
 CFG_URL = "https://meity-auth.ulcacontrib.org/ulca/apis/v0/model/getModelsPipeline"
+# ULCA expects ISO codes; accept the spellings clients already send.
+LANG_ALIASES = {"English": "en"}
+# Bhashini's supported languages (the 22 scheduled languages plus English).
+# Checked before any ULCA call, so unknown codes never reach the config host
+# and the per-chain config cache and locks stay bounded.
+SUPPORTED_LANGS = {
+    "as", "bn", "brx", "doi", "en", "gom", "gu", "hi", "kn", "ks", "mai", "ml",
+    "mni", "mr", "ne", "or", "pa", "sa", "sat", "sd", "ta", "te", "ur",
+}
+# The pipeline cache holds whole base64 TTS clips, so it is bounded by bytes
+# (per worker process) rather than by entry count.
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_TTL = 3600
+PIPELINE_CFG_TTL = 3600
+BREAKER_FAIL_MAX = 5
+BREAKER_RESET_TIMEOUT = 30.0
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 25_000_000))
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # boundaries + the language field
+# curl -F and many HTTP clients send WAV files as application/octet-stream;
+# the RIFF/WAVE header check in process_audio_pipeline covers those.
+ALLOWED_AUDIO_TYPES = {
+    "audio/wav", "audio/x-wav", "audio/wave", "audio/vnd.wave", "application/octet-stream",
+}
+TTS_MEDIA_TYPE = "audio/wav"
 
-def _bhashini_headers() -> dict[str, str]:
-    return {
-        "userID": ULCA_USER_ID,
-        "ulcaApiKey": ULCA_API_KEY,
-        "Authorization": BHASHINI_AUTH,
-        "Content-Type": "application/json",
-    }
+# ---------------------------------------------------------------------------
+# Logging
+# ---------------------------------------------------------------------------
+# Only the app logger runs at INFO; the root level is left alone so httpx
+# does not log every outbound request. The queue handler is installed in the
+# lifespan (see below): it only enqueues, and a listener thread does the
+# blocking stderr write, so logging never stalls the event loop.
+logger = logging.getLogger("bhashini_app")
+logger.setLevel(logging.INFO)
+
+# ---------------------------------------------------------------------------
+# Shared HTTP client
+# ---------------------------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client for the whole app so Bhashini calls reuse warm
+    # TCP/TLS connections instead of handshaking on every request. HTTP/2
+    # multiplexes concurrent requests to the same host over one connection.
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(120.0),
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=20,
+            keepalive_expiry=30,
+        ),
+    )
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    log_listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    log_listener.start()
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+        root.removeHandler(queue_handler)
+        log_listener.stop()
 
 # ---------------------------------------------------------------------------
 # FastAPI app and CORS setup
 # ---------------------------------------------------------------------------
-app = FastAPI(title="Bhashini Voice App")
+app = FastAPI(title="Bhashini Voice App", lifespan=lifespan)
+
+class _BodyTooLarge(HTTPException):
+    def __init__(self) -> None:
+        super().__init__(413, f"Audio exceeds {MAX_UPLOAD_BYTES} bytes")
+
+class UploadLimitMiddleware:
+    """Cap the request body of POST /process-audio at `max_body` bytes.
+
+    Starlette parses (and spools to disk) the whole multipart body before the
+    handler runs, so the limit is enforced here by counting bytes as they come
+    out of `receive()`. That also covers chunked uploads with no
+    Content-Length; a declared Content-Length is only used as an early exit.
+    """
+
+    def __init__(self, app, max_body: int):
+        self.app = app
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != "/process-audio":
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None:
+            if not length.isdigit():
+                return await JSONResponse({"detail": "Invalid Content-Length"}, status_code=400)(scope, receive, send)
+            if int(length) > self.max_body:
+                return await JSONResponse({"detail": _BodyTooLarge().detail}, status_code=413)(scope, receive, send)
+
+        received = 0
+        started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body:
+                    # An HTTPException, so FastAPI's body parsing re-raises it
+                    # and the app answers 413 instead of a generic 400.
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge as e:
+            if started:
+                raise
+            await JSONResponse({"detail": e.detail}, status_code=413)(scope, receive, send)
+
+# Registered before CORS so CORS stays outermost and rejections carry its headers.
+app.add_middleware(UploadLimitMiddleware, max_body=MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES)
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Change this in prod
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["X-Original-Text", "X-Translated-Text", "X-Final-Text"],
+    max_age=86400,  # let browsers cache preflights for a day
 )
 
 # ---------------------------------------------------------------------------
@@ -60,125 +198,375 @@ class TextRequest(BaseModel):
     language: str
 
 class BackendResponse(BaseModel):
+    # Frozen so cached instances can be shared safely between requests.
+    model_config = ConfigDict(frozen=True)
+
     original_text: str
     translated_text: str
     final_text: str
     audio_base64: str
 
+# ---------------------------------------------------------------------------
+# Response cache
+# ---------------------------------------------------------------------------
+# Text pipeline output is a function of (text, language), and traffic repeats
+# a lot (greetings, prompts), so hits skip the Bhashini round trip entirely.
+# Lookups and inserts never await, so no lock is needed on the event loop.
+_pipeline_cache: TTLCache = TTLCache(
+    maxsize=CACHE_MAX_BYTES,
+    ttl=CACHE_TTL,
+    getsizeof=lambda r: len(r.audio_base64) + len(r.original_text) + len(r.translated_text) + len(r.final_text),
+)
+_cache_stats = {"hits": 0, "misses": 0}
+
+def _cache_key(*parts: str) -> bytes:
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=16).digest()
+
+# ---------------------------------------------------------------------------
+# Retry and circuit breaking
+# ---------------------------------------------------------------------------
+class _CircuitBreaker:
+    """Fail fast on a host after `fail_max` consecutive failures.
+
+    Once open, requests are rejected for `reset_timeout` seconds. After that a
+    single probe is let through (half-open) while everyone else keeps getting
+    rejected; the probe's outcome closes or reopens the breaker.
+    """
+
+    def __init__(self, fail_max: int = BREAKER_FAIL_MAX, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        self.probing = True
+        return True
+
+    def record(self, ok: bool) -> None:
+        probe, self.probing = self.probing, False
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        if probe or self.failures >= self.fail_max:
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give up a probe that ended without an outcome (e.g. cancelled)."""
+        self.probing = False
+
+_breakers: dict[str, _CircuitBreaker] = {}
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.2, max=2.0, jitter=0.2),
+    # Only errors raised before the request reaches the server are retried:
+    # resending after a read timeout would re-run (and re-upload) a possibly
+    # already-processed inference call and multiply the 120 s timeout.
+    retry=retry_if_exception_type((httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)),
+    reraise=True,
+)
+async def _post_with_retry(client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+    return await client.post(url, **kwargs)
+
+async def _bhashini_post(client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+    """POST with connect-error retries, behind a per-host circuit breaker."""
+    host = httpx.URL(url).host
+    breaker = _breakers.setdefault(host, _CircuitBreaker())
+    if not breaker.allow():
+        raise HTTPException(503, f"{host} is unavailable, try again later")
+    try:
+        r = await _post_with_retry(client, url, **kwargs)
+    except httpx.TransportError as e:
+        breaker.record(False)
+        raise HTTPException(502, f"{host} request failed: {type(e).__name__}") from e
+    except BaseException:
+        breaker.release()
+        raise
+    breaker.record(r.status_code < 500)
+    return r
+
 # ---------------------------------------------------------------------------
 # Core functions
 # ---------------------------------------------------------------------------
-async def bhashini_translate(text: str, src_lang: str, tgt_lang: str) -> str:
-    payload = {
-        "inputText": text,
-        "inputLanguage": src_lang,
-        "outputLanguage": tgt_lang,
-    }
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.post(TRANSLATE_URL, headers=_bhashini_headers(), json=payload)
-        if r.status_code != 200:
-            raise HTTPException(r.status_code, f"Translate error: {r.text}")
-        return r.text.strip()
-
-async def bhashini_tts(text: str, lang: str) -> bytes:
-    payload = {
-        "text": text,
-        "language": lang,
-        "voiceName": "Female1"
-    }
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.post(TTS_URL, headers=_bhashini_headers(), json=payload)
-        if r.status_code != 200:
-            raise HTTPException(r.status_code, f"TTS error: {r.text}")
-        return r.content
-
-async def bhashini_asr(wav_path: Path, lang: str) -> str:
-    cfg_payload = {
-        "pipelineId": ASR_PIPELINE_ID,
-        "taskType": "asr"
-    }
-    cfg_headers = {
-        "userID": ULCA_USER_ID,
-        "ulcaApiKey": ULCA_API_KEY,
-    }
+def _normalize_lang(lang: str) -> str:
+    lang = LANG_ALIASES.get(lang, lang)
+    if lang not in SUPPORTED_LANGS:
+        raise HTTPException(400, f"Unsupported language: {lang}")
+    return lang
 
-    async with httpx.AsyncClient(timeout=20) as client:
-        cfg = await client.post(CFG_URL, headers=cfg_headers, json=cfg_payload)
-        cfg.raise_for_status()
+def _pipeline_tasks(lang: str, with_asr: bool) -> list[dict]:
+    """Build the task chain: [asr] -> [translate src->en -> en->src] -> tts."""
+    tasks = []
+    if with_asr:
+        tasks.append({"taskType": "asr", "config": {"language": {"sourceLanguage": lang}}})
+    if lang != "en":
+        tasks.append({
+            "taskType": "translation",
+            "config": {"language": {"sourceLanguage": lang, "targetLanguage": "en"}},
+        })
+        tasks.append({
+            "taskType": "translation",
+            "config": {"language": {"sourceLanguage": "en", "targetLanguage": lang}},
+        })
+    tasks.append({"taskType": "tts", "config": {"language": {"sourceLanguage": lang}}})
+    return tasks
 
-    data = cfg.json()
-    inf_url = data["pipelineInferenceAPIEndPoint"]["callbackUrl"]
-    svc_id = data["pipelineInferenceAPIEndPoint"]["serviceId"]
-    key_name = data["pipelineInferenceAPIEndPoint"]["inferenceApiKey"]["name"]
-    key_val = data["pipelineInferenceAPIEndPoint"]["inferenceApiKey"]["value"]
+# getModelsPipeline output (callback URL, service ids, inference key) is
+# effectively static per task chain, so it is cached rather than refetched
+# on every request. A lock per task chain stops concurrent misses for the
+# same chain from all refetching without making other chains wait.
+_pipeline_cfg: dict[tuple, tuple[float, dict]] = {}
+_pipeline_cfg_locks: dict[tuple, asyncio.Lock] = {}
 
-    with open(wav_path, "rb") as f:
-        audio_b64 = base64.b64encode(f.read()).decode()
+def _task_key(task_type: str, language: dict) -> tuple:
+    return (task_type, language["sourceLanguage"], language.get("targetLanguage"))
 
-    inference_payload = {
-        "pipelineTasks": [
-            {
-                "taskType": "asr",
-                "config": {
-                    "language": {"sourceLanguage": lang},
-                    "serviceId": svc_id,
-                    "audioFormat": "wav",
-                    "samplingRate": 16000
-                }
-            }
-        ],
-        "inputData": {
-            "audio": [{"audioContent": audio_b64}]
+def _pipeline_cfg_key(tasks: list[dict]) -> tuple:
+    return tuple(_task_key(t["taskType"], t["config"]["language"]) for t in tasks)
+
+def _service_ids(tasks: list[dict], response_config: list[dict]) -> list[str]:
+    """Pick each task's serviceId by task type + language pair, not position."""
+    available: dict[tuple, str] = {}
+    for entry in response_config:
+        for c in entry["config"]:
+            available.setdefault(_task_key(entry["taskType"], c["language"]), c["serviceId"])
+    try:
+        return [available[_task_key(t["taskType"], t["config"]["language"])] for t in tasks]
+    except KeyError as e:
+        raise HTTPException(502, f"ULCA pipeline config has no service for {e.args[0]}")
+
+def _check_upstream(r: httpx.Response, what: str) -> None:
+    """Turn a non-2xx Bhashini response into an HTTPException with its body.
+
+    Client errors are forwarded as-is, except 401/403, which concern our own
+    credentials; those and 5xx become a 502 for the caller.
+    """
+    if r.is_success:
+        return
+    status = r.status_code if 400 <= r.status_code < 500 and r.status_code not in (401, 403) else 502
+    raise HTTPException(status, f"{what} error ({r.status_code}): {r.text}")
+
+def _loads_upstream(r: httpx.Response, what: str) -> dict:
+    try:
+        return orjson.loads(r.content)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(502, f"{what} returned invalid JSON: {e}")
+
+async def _get_pipeline_cfg(client: httpx.AsyncClient, tasks: list[dict]) -> dict:
+    key = _pipeline_cfg_key(tasks)
+    entry = _pipeline_cfg.get(key)
+    if entry is not None and time.monotonic() - entry[0] < PIPELINE_CFG_TTL:
+        return entry[1]
+
+    async with _pipeline_cfg_locks.setdefault(key, asyncio.Lock()):
+        entry = _pipeline_cfg.get(key)
+        if entry is not None and time.monotonic() - entry[0] < PIPELINE_CFG_TTL:
+            return entry[1]
+
+        cfg_payload = {
+            "pipelineTasks": tasks,
+            "pipelineRequestConfig": {"pipelineId": ASR_PIPELINE_ID},
         }
+        cfg = await _bhashini_post(client, CFG_URL, headers=ULCA_CFG_HEADERS, json=cfg_payload, timeout=20)
+        _check_upstream(cfg, "Pipeline config")
+        data = _loads_upstream(cfg, "Pipeline config")
+
+        # Pull out what the inference call needs once, at fetch time, so
+        # cache hits don't rebuild headers or walk the response again.
+        try:
+            endpoint = data["pipelineInferenceAPIEndPoint"]
+            api_key = endpoint["inferenceApiKey"]
+            entry_cfg = {
+                "url": endpoint["callbackUrl"],
+                "headers": MappingProxyType({
+                    api_key["name"]: api_key["value"],
+                    "Content-Type": "application/json",
+                }),
+                "service_ids": _service_ids(tasks, data["pipelineResponseConfig"]),
+            }
+        except (KeyError, IndexError, TypeError) as e:
+            raise HTTPException(502, f"Pipeline config failed to parse: {e}")
+        _pipeline_cfg[key] = (time.monotonic(), entry_cfg)
+        return entry_cfg
+
+async def _run_pipeline(client: httpx.AsyncClient, cfg: dict, tasks: list[dict], input_data: dict) -> httpx.Response:
+    inference_tasks = []
+    for task, svc_id in zip(tasks, cfg["service_ids"], strict=True):
+        config = {**task["config"], "serviceId": svc_id}
+        if task["taskType"] == "asr":
+            config.update(audioFormat="wav", samplingRate=16000)
+        elif task["taskType"] == "tts":
+            config.update(gender="female")
+        inference_tasks.append({"taskType": task["taskType"], "config": config})
+
+    inference_payload = {
+        "pipelineTasks": inference_tasks,
+        "inputData": input_data,
     }
 
-    async with httpx.AsyncClient(timeout=120) as client:
-        r = await client.post(inf_url, headers={key_name: key_val}, json=inference_payload)
-        r.raise_for_status()
+    # The payload can carry megabytes of base64 audio; orjson serializes it
+    # far faster than the stdlib encoder httpx uses for `json=`.
+    return await _bhashini_post(
+        client,
+        cfg["url"],
+        headers=cfg["headers"],
+        content=orjson.dumps(inference_payload),
+    )
+
+async def bhashini_pipeline(client: httpx.AsyncClient, tasks: list[dict], input_data: dict) -> list[dict]:
+    """Run `tasks` as one compound ULCA pipeline call and return its responses."""
+    for attempt in range(2):
+        cfg = await _get_pipeline_cfg(client, tasks)
+        r = await _run_pipeline(client, cfg, tasks, input_data)
+        if r.status_code in (401, 403) and attempt == 0:
+            # The inference key may have rotated; refetch the config once.
+            _pipeline_cfg.pop(_pipeline_cfg_key(tasks), None)
+            continue
+        _check_upstream(r, "Pipeline inference")
+        # Parse the raw bytes: the response embeds base64 TTS audio, and
+        # orjson skips the str decode that r.json() would do first.
+        data = _loads_upstream(r, "Pipeline inference")
         try:
-            return r.json()["pipelineResponse"][0]["output"]
-        except Exception as e:
-            raise HTTPException(500, f"ASR failed to parse output: {e}")
+            return data["pipelineResponse"]
+        except (KeyError, TypeError) as e:
+            raise HTTPException(502, f"Pipeline inference failed to parse: {e}")
 
-# ---------------------------------------------------------------------------
-# Processing pipeline
-# ---------------------------------------------------------------------------
-async def process_text_pipeline(text: str, lang: str) -> BackendResponse:
-    translated = await bhashini_translate(text, lang, "en")
-    final_text = await bhashini_translate(translated, "en", lang)
-    audio_bytes = await bhashini_tts(final_text, lang)
+def _to_backend_response(responses: list[dict], text: Optional[str], lang: str) -> BackendResponse:
+    try:
+        i = 0
+        if text is None:
+            text = responses[i]["output"][0]["source"]
+            i += 1
+        if lang == "en":
+            translated = final_text = text
+        else:
+            translated = responses[i]["output"][0]["target"]
+            final_text = responses[i + 1]["output"][0]["target"]
+            i += 2
+        audio_b64 = responses[i]["audio"][0]["audioContent"]
+    except (KeyError, IndexError, TypeError) as e:
+        raise HTTPException(500, f"Pipeline failed to parse output: {e}")
     return BackendResponse(
         original_text=text,
         translated_text=translated,
         final_text=final_text,
-        audio_base64=base64.b64encode(audio_bytes).decode()
+        audio_base64=audio_b64
     )
 
-async def process_audio_pipeline(file: UploadFile, lang: str) -> BackendResponse:
-    suffix = Path(file.filename or "audio").suffix or ".wav"
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(await file.read())
-        tmp_path = Path(tmp.name)
+# ---------------------------------------------------------------------------
+# Processing pipeline
+# ---------------------------------------------------------------------------
+async def process_text_pipeline(client: httpx.AsyncClient, text: str, lang: str) -> BackendResponse:
+    lang = _normalize_lang(lang)
+    key = _cache_key(lang, text)
+    cached = _pipeline_cache.get(key)
+    if cached is not None:
+        _cache_stats["hits"] += 1
+        return cached
+    _cache_stats["misses"] += 1
 
+    responses = await bhashini_pipeline(
+        client,
+        _pipeline_tasks(lang, with_asr=False),
+        {"input": [{"source": text}]},
+    )
+    result = _to_backend_response(responses, text, lang)
     try:
-        stt_text = await bhashini_asr(tmp_path, lang)
-        return await process_text_pipeline(stt_text, lang)
-    finally:
-        tmp_path.unlink(missing_ok=True)
+        _pipeline_cache[key] = result
+    except ValueError:
+        pass  # a single result larger than the whole cache; just don't cache it
+    return result
+
+async def process_audio_pipeline(client: httpx.AsyncClient, file: UploadFile, lang: str) -> BackendResponse:
+    lang = _normalize_lang(lang)
+    if file.content_type not in ALLOWED_AUDIO_TYPES:
+        raise HTTPException(415, f"Unsupported audio type: {file.content_type}")
+
+    audio_bytes = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        audio_bytes += chunk
+        if len(audio_bytes) > MAX_UPLOAD_BYTES:
+            raise HTTPException(413, f"Audio exceeds {MAX_UPLOAD_BYTES} bytes")
+
+    if audio_bytes[:4] != b"RIFF" or audio_bytes[8:12] != b"WAVE":
+        raise HTTPException(415, "Audio must be a WAV (RIFF/WAVE) file")
+
+    # Encoding a multi-MB upload is CPU-bound; keep it off the event loop.
+    audio_b64 = (await asyncio.to_thread(pybase64.b64encode, audio_bytes)).decode("ascii")
+    responses = await bhashini_pipeline(
+        client,
+        _pipeline_tasks(lang, with_asr=True),
+        {"audio": [{"audioContent": audio_b64}]},
+    )
+    return _to_backend_response(responses, None, lang)
 
 # ---------------------------------------------------------------------------
 # API routes
 # ---------------------------------------------------------------------------
 @app.post("/process-text", response_model=BackendResponse)
-async def process_text(request: TextRequest):
-    return await process_text_pipeline(request.text, request.language)
+async def process_text(body: TextRequest, request: Request) -> BackendResponse:
+    return await process_text_pipeline(request.app.state.http, body.text, body.language)
+
+@app.post(
+    "/process-text/audio",
+    response_class=Response,
+    responses={200: {"content": {TTS_MEDIA_TYPE: {}}}},
+)
+async def process_text_audio(body: TextRequest, request: Request) -> Response:
+    # Same pipeline as /process-text, but the audio goes out as raw bytes
+    # instead of a base64 JSON field; the texts ride along in headers.
+    result = await process_text_pipeline(request.app.state.http, body.text, body.language)
+    return Response(
+        content=pybase64.b64decode(result.audio_base64),
+        media_type=TTS_MEDIA_TYPE,
+        headers={
+            "X-Original-Text": urllib.parse.quote(result.original_text),
+            "X-Translated-Text": urllib.parse.quote(result.translated_text),
+            "X-Final-Text": urllib.parse.quote(result.final_text),
+        },
+    )
 
 @app.post("/process-audio", response_model=BackendResponse)
-async def process_audio(audio: UploadFile = File(...), language: str = Form(...)):
+async def process_audio(request: Request, audio: UploadFile = File(...), language: str = Form(...)) -> BackendResponse:
     try:
-        print(f"Received audio: {audio.filename}, content_type: {audio.content_type}, language: {language}")
-        return await process_audio_pipeline(audio, language)
-    except Exception as e:
-        print("❌ Exception in /process-audio:", e)
-        traceback.print_exc()
+        logger.info(
+            "Received audio: %s, content_type: %s, language: %s",
+            audio.filename, audio.content_type, language,
+        )
+        return await process_audio_pipeline(request.app.state.http, audio, language)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Exception in /process-audio")
         raise HTTPException(500, "Internal Server Error")
+
+@app.get("/cache-stats")
+async def cache_stats():
+    return {
+        **_cache_stats,
+        "size": len(_pipeline_cache),
+        "bytes": _pipeline_cache.currsize,
+        "max_bytes": _pipeline_cache.maxsize,
+    }
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # uvloop + httptools are the C event loop and HTTP parser from
+    # uvicorn[standard]; pinned explicitly so a missing extra fails loudly.
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", 8000)),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+    )